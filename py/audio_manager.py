@@ -1,20 +1,24 @@
 import asyncio
-import uuid
+import functools
+import logging
 import queue
 import threading
-import time
-from typing import Optional, Dict, Any
+import uuid
+from collections import deque
+from typing import Optional, Dict, Any, Deque
 import wave
 import pyaudio
+import sounddevice as sd
 import signal
 from dataclasses import dataclass
-from pydub import AudioSegment
-import io
 import numpy as np
+import opuslib
 
 import config
 from realtime_dialog_client import RealtimeDialogClient
 
+log = logging.getLogger(__name__)
+
 
 @dataclass
 class AudioConfig:
@@ -26,15 +30,195 @@ class AudioConfig:
     chunk: int
 
 
+class PCMRingBuffer:
+    """单生产者/单消费者 PCM 环形缓冲区
+
+    预分配固定大小的 bytearray，_head 只由生产者推进，_tail 只由消费者推进，
+    两端都不加锁。清空操作也不直接修改 _tail，而是记录丢弃位置，由消费者在下次读取时生效。
+    """
+
+    def __init__(self, capacity: int):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self._size = size
+        self._mask = size - 1
+        self._buf = bytearray(size)
+        self._view = memoryview(self._buf)
+        self._head = 0  # 已写入总字节数，仅生产者修改
+        self._tail = 0  # 已读取总字节数，仅消费者修改
+        self._clear_to = 0  # 请求丢弃到的位置，消费者只读不写
+
+    def __len__(self) -> int:
+        """当前可读字节数"""
+        return self._head - max(self._tail, self._clear_to)
+
+    def write(self, data) -> int:
+        """写入数据，返回实际写入的字节数（缓冲区满时多余部分被丢弃）"""
+        src = memoryview(data).cast('B')
+        n = min(len(src), self._size - (self._head - self._tail))
+        if n <= 0:
+            return 0
+        start = self._head & self._mask
+        first = min(n, self._size - start)
+        self._view[start:start + first] = src[:first]
+        if first < n:
+            self._view[:n - first] = src[first:n]
+        self._head += n
+        return n
+
+    def read_into(self, out, n: int) -> int:
+        """读取最多 n 字节到 out，返回实际读取的字节数"""
+        if self._clear_to > self._tail:
+            self._tail = self._clear_to
+        dst = memoryview(out).cast('B')
+        n = min(n, len(dst), self._head - self._tail)
+        if n <= 0:
+            return 0
+        start = self._tail & self._mask
+        first = min(n, self._size - start)
+        dst[:first] = self._view[start:start + first]
+        if first < n:
+            dst[first:n] = self._view[:n - first]
+        self._tail += n
+        return n
+
+    def clear(self) -> None:
+        """丢弃所有未读数据，O(1)，可在消费者以外的线程调用，多个线程调用时需保证先后顺序"""
+        self._clear_to = self._head
+
+
+class OggOpusDecoder:
+    """OGG/Opus 流式解码器
+
+    逐页解析 OGG 容器，把其中的 Opus 包直接交给 libopus 解码为 int16 PCM，
+    输出采样率和声道数由 libopus 直接生成，因此只支持 Opus 原生采样率。
+    """
+
+    OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+    def __init__(self, sample_rate: int, channels: int):
+        if sample_rate not in self.OPUS_SAMPLE_RATES:
+            raise ValueError(f"OGG/Opus 输出采样率必须是 {self.OPUS_SAMPLE_RATES} 之一，当前为 {sample_rate}")
+        self._channels = channels
+        self._decode_rate = sample_rate
+        self._decoder = opuslib.Decoder(sample_rate, channels)
+        # Opus 单个包最长 120ms
+        self._max_frame_size = sample_rate * 120 // 1000
+        # 尚未凑成完整页面的数据片段，凑够 _pending_needed 字节后才拼接
+        self._pending: Deque[bytes] = deque()
+        self._pending_bytes = 0
+        self._pending_needed = 0
+        # 跨页面尚未结束的 Opus 包片段
+        self._packet_parts: Deque[bytes] = deque()
+        # 流开头需要丢弃的编码器预热数据（OpusHead 中的 pre-skip）
+        self._skip_bytes = 0
+
+    def reset(self) -> None:
+        """丢弃当前流的解析和解码状态，下一次输入视为新的流"""
+        self._decoder.reset_state()
+        self._pending.clear()
+        self._pending_bytes = 0
+        self._pending_needed = 0
+        self._packet_parts.clear()
+        self._skip_bytes = 0
+
+    def decode(self, data: bytes) -> bytes:
+        """输入任意长度的 OGG 数据，返回其中已完整的 Opus 包解码得到的 PCM"""
+        if self._pending:
+            self._pending.append(data)
+            self._pending_bytes += len(data)
+            if self._pending_bytes < self._pending_needed:
+                return b''
+            buf = b''.join(self._pending)
+            self._pending.clear()
+            self._pending_bytes = 0
+        else:
+            buf = bytes(data)
+
+        pcm = bytearray()
+        offset = 0
+        needed = 27
+        while len(buf) - offset >= 27:
+            if buf[offset:offset + 4] != b'OggS':
+                # 丢失同步，跳到下一个页面头
+                next_page = buf.find(b'OggS', offset + 1)
+                if next_page < 0:
+                    offset = max(offset, len(buf) - 3)
+                    break
+                offset = next_page
+                continue
+            header_type = buf[offset + 5]
+            n_segments = buf[offset + 26]
+            header_end = offset + 27 + n_segments
+            if len(buf) < header_end:
+                needed = header_end - offset
+                break
+            lacing = buf[offset + 27:header_end]
+            page_end = header_end + sum(lacing)
+            if len(buf) < page_end:
+                needed = page_end - offset
+                break
+            if not header_type & 0x01:
+                # 不是续页，丢弃上一页残留的不完整包
+                self._packet_parts.clear()
+            pos = header_end
+            for size in lacing:
+                segment = buf[pos:pos + size]
+                pos += size
+                if size == 255:
+                    self._packet_parts.append(segment)
+                elif self._packet_parts:
+                    self._packet_parts.append(segment)
+                    self._decode_packet(b''.join(self._packet_parts), pcm)
+                    self._packet_parts.clear()
+                else:
+                    self._decode_packet(segment, pcm)
+            offset = page_end
+            needed = 27
+
+        if offset < len(buf):
+            self._pending.append(buf[offset:])
+            self._pending_bytes = len(buf) - offset
+            self._pending_needed = needed
+        return bytes(pcm)
+
+    def _decode_packet(self, packet: bytes, pcm: bytearray) -> None:
+        """解码单个 Opus 包，跳过 OpusHead/OpusTags 头部包"""
+        if packet.startswith(b'OpusHead'):
+            # pre-skip 以 48kHz 样本数计，换算到解码采样率下的字节数
+            pre_skip = int.from_bytes(packet[10:12], 'little')
+            self._skip_bytes = pre_skip * self._decode_rate // 48000 * self._channels * 2
+            return
+        if packet.startswith(b'OpusTags'):
+            return
+        try:
+            decoded = self._decoder.decode(packet, self._max_frame_size)
+        except opuslib.OpusError as e:
+            log.warning("Opus 解码失败: %s", e)
+            return
+        if self._skip_bytes:
+            skip = min(self._skip_bytes, len(decoded))
+            decoded = decoded[skip:]
+            self._skip_bytes -= skip
+        pcm += decoded
+
+
 class AudioDeviceManager:
     """音频设备管理类，处理音频输入输出"""
 
+    # PyAudio 样本格式对应的 sounddevice 输出数据类型
+    OUTPUT_DTYPES = {
+        pyaudio.paInt16: 'int16',
+        pyaudio.paFloat32: 'float32',
+    }
+
     def __init__(self, input_config: AudioConfig, output_config: AudioConfig):
         self.input_config = input_config
         self.output_config = output_config
         self.pyaudio = pyaudio.PyAudio()
         self.input_stream: Optional[pyaudio.Stream] = None
-        self.output_stream: Optional[pyaudio.Stream] = None
+        self.output_stream: Optional[sd.RawOutputStream] = None
 
     def open_input_stream(self) -> pyaudio.Stream:
         """打开音频输入流"""
@@ -48,70 +232,127 @@ class AudioDeviceManager:
         )
         return self.input_stream
 
-    def open_output_stream(self) -> pyaudio.Stream:
-        """打开音频输出流"""
-        self.output_stream = self.pyaudio.open(
-            format=self.output_config.bit_size,
+    def open_output_stream(self, callback) -> sd.RawOutputStream:
+        """打开音频输出流，由 PortAudio 的实时线程调用 callback 拉取数据"""
+        dtype = self.OUTPUT_DTYPES.get(self.output_config.bit_size)
+        if dtype is None:
+            raise ValueError(f"不支持的输出样本格式: {self.output_config.bit_size}")
+        self.output_stream = sd.RawOutputStream(
+            samplerate=self.output_config.sample_rate,
             channels=self.output_config.channels,
-            rate=self.output_config.sample_rate,
-            output=True,
-            frames_per_buffer=self.output_config.chunk
+            dtype=dtype,
+            blocksize=self.output_config.chunk,
+            callback=callback
         )
+        self.output_stream.start()
         return self.output_stream
 
     def cleanup(self) -> None:
         """清理音频设备资源"""
-        for stream in [self.input_stream, self.output_stream]:
-            if stream:
-                stream.stop_stream()
-                stream.close()
+        if self.input_stream:
+            self.input_stream.stop_stream()
+            self.input_stream.close()
+        if self.output_stream:
+            self.output_stream.stop()
+            self.output_stream.close()
         self.pyaudio.terminate()
 
 
+# TTS PCM 格式对应的样本格式，pcm 为 32bit float，pcm_s16le 为 16bit int
+TTS_PCM_FORMATS = {
+    "pcm": pyaudio.paFloat32,
+    "pcm_s16le": pyaudio.paInt16,
+}
+
+
 class DialogSession:
     """对话会话管理类"""
 
     def __init__(self, ws_config: Dict[str, Any]):
+        self.output_config = AudioConfig(**config.output_audio_config)
+        # 先校验音频配置，再打开音频设备和线程，配置错误时不会遗留已打开的资源
+        if self.output_config.bit_size not in AudioDeviceManager.OUTPUT_DTYPES:
+            raise ValueError(f"不支持的输出样本格式: {self.output_config.bit_size}")
+
+        # 会话内音频格式不会变化，按会话配置选定音频包处理函数：
+        # 明确请求 PCM 时直接写入播放缓冲区，未配置 TTS 时服务端返回 OGG/Opus，
+        # 其余情况在首个音频包上检测一次格式后固定下来
+        self._tts_configured = 'tts' in config.start_session_req
+        tts_audio_config = config.start_session_req.get('tts', {}).get('audio_config', {})
+        tts_format = tts_audio_config.get('format', '')
+        if tts_format.startswith('pcm'):
+            # PCM 会原样写入播放缓冲区，请求的格式必须与输出配置一致
+            if TTS_PCM_FORMATS.get(tts_format) != self.output_config.bit_size or \
+                    tts_audio_config.get('sample_rate') != self.output_config.sample_rate or \
+                    tts_audio_config.get('channel') != self.output_config.channels:
+                raise ValueError(f"TTS 音频配置 {tts_audio_config} 与输出音频配置不一致")
+            self._handle_ack = self._handle_ack_pcm
+        elif not self._tts_configured:
+            self._handle_ack = self._handle_ack_ogg
+        else:
+            self._handle_ack = self._handle_ack_detect
+
+        # OGG/Opus 流式解码器，在独立线程中解码，避免阻塞 WebSocket 接收
+        # 明确请求 PCM 的会话不会收到 OGG，不创建解码器
+        self.ogg_decoder: Optional[OggOpusDecoder] = None
+        if self._handle_ack != self._handle_ack_pcm:
+            # 解码器只输出 int16 PCM
+            if self.output_config.bit_size != pyaudio.paInt16:
+                raise ValueError("OGG/Opus 解码输出为 int16，输出音频配置必须使用 paInt16")
+            self.ogg_decoder = OggOpusDecoder(self.output_config.sample_rate, self.output_config.channels)
+
         self.session_id = str(uuid.uuid4())
         self.client = RealtimeDialogClient(config=ws_config, session_id=self.session_id)
         self.audio_device = AudioDeviceManager(
             AudioConfig(**config.input_audio_config),
             AudioConfig(**config.output_audio_config)
         )
-        self.output_config = AudioConfig(**config.output_audio_config)
 
         self.is_running = True
         self.is_session_finished = False
+        # 用事件代替轮询等待退出信号和会话结束
+        self._loop = asyncio.get_event_loop()
+        self._shutdown = asyncio.Event()
+        self._session_finished_evt = asyncio.Event()
+        self._mic_task: Optional[asyncio.Task] = None
 
         signal.signal(signal.SIGINT, self._keyboard_signal)
-        # 初始化音频队列和输出流
-        self.audio_queue = queue.Queue()
-        self.output_stream = self.audio_device.open_output_stream()
-        # 启动播放线程
+        # 初始化音频缓冲区和输出流，预留约 512 个 chunk 的空间容纳服务端突发下发的音频
+        self._frame_bytes = self.output_config.channels * pyaudio.get_sample_size(self.output_config.bit_size)
+        self.audio_ring = PCMRingBuffer(self.output_config.chunk * self._frame_bytes * 512)
+        # 预分配一个 chunk 的静音数据，欠载时直接拷贝，回调中不再分配内存
+        self._pcm_silence = np.zeros(self.output_config.chunk * self._frame_bytes, dtype=np.uint8)
+        self._silence_view = memoryview(self._pcm_silence)
         self.is_recording = True
-        self.is_playing = True
-        self.player_thread = threading.Thread(target=self._audio_player_thread)
-        self.player_thread.daemon = True
-        self.player_thread.start()
-        
-        # OGG 流缓存
-        self.ogg_buffer = bytearray()
-        self.ogg_pages_count = 0
+        # 调试用：将麦克风输入持续写入同一个 WAV 文件
+        self.debug_wav: Optional[wave.Wave_write] = None
+        if config.debug_record:
+            self.debug_wav = wave.open("output.wav", 'wb')
+            self.debug_wav.setnchannels(config.input_audio_config["channels"])
+            self.debug_wav.setsampwidth(pyaudio.get_sample_size(config.input_audio_config["bit_size"]))
+            self.debug_wav.setframerate(config.input_audio_config["sample_rate"])
+        self.output_stream = self.audio_device.open_output_stream(self._pa_callback)
 
-    def _audio_player_thread(self):
-        """音频播放线程"""
-        while self.is_playing:
-            try:
-                # 从队列获取音频数据
-                audio_data = self.audio_queue.get(timeout=1.0)
-                if audio_data is not None:
-                    self.output_stream.write(audio_data)
-            except queue.Empty:
-                # 队列为空时等待一小段时间
-                time.sleep(0.1)
-            except Exception as e:
-                print(f"音频播放错误: {e}")
-                time.sleep(0.1)
+        # 队列元素为 (代次, OGG 数据)，数据为 None 表示打断后重置解码状态；
+        # 每次打断代次加一，解码线程丢弃旧代次的解码结果。PCM 会话不启动解码线程
+        self._decode_q: queue.Queue = queue.Queue(maxsize=32)
+        self._decode_generation = 0
+        self._decode_thread: Optional[threading.Thread] = None
+        if self.ogg_decoder:
+            self._decode_thread = threading.Thread(target=self._decode_worker)
+            self._decode_thread.daemon = True
+            self._decode_thread.start()
+
+    def _pa_callback(self, outdata, frames, time_info, status) -> None:
+        """音频输出回调，缓冲区数据不足时以静音补齐"""
+        want = frames * self._frame_bytes
+        available = len(self.audio_ring)
+        if available < want:
+            # 只读取完整的帧，避免后续数据错位
+            want = available - available % self._frame_bytes
+        n = self.audio_ring.read_into(outdata, want)
+        if n < len(outdata):
+            outdata[n:] = self._silence_view[:len(outdata) - n]
 
     def _detect_audio_format(self, audio_data: bytes) -> str:
         """检测音频格式"""
@@ -127,115 +368,94 @@ class DialogSession:
             return "ogg"  # WebM 也用 OGG 解码器处理
         
         # 检查 Opus 在 OGG 中的特征
-        if b'OpusHead' in audio_data[:64]:
+        if b'OpusHead' in bytes(audio_data[:64]):
             return "ogg"
         
         # 根据配置判断：如果没有配置 TTS，很可能是压缩格式
-        if not hasattr(config, 'start_session_req') or 'tts' not in config.start_session_req:
+        if not self._tts_configured:
             # 没有 TTS 配置时，尝试作为压缩音频处理
             return "ogg"
         
         # 默认为 PCM
         return "pcm"
     
-    def _process_ogg_stream(self, ogg_page: bytes) -> bytes:
-        """处理 OGG 流式数据"""
-        # 将新的 OGG 页面添加到缓冲区
-        self.ogg_buffer.extend(ogg_page)
-        self.ogg_pages_count += 1
-        
-        print(f"累积 OGG 页面: {self.ogg_pages_count}, 缓冲区大小: {len(self.ogg_buffer)} 字节")
-        
-        # 动态调整阈值：从3个页面开始尝试，最多等到8个页面
-        min_pages = 3
-        max_pages = 8
-        
-        if self.ogg_pages_count >= min_pages:
-            for attempt_pages in range(min_pages, min(self.ogg_pages_count + 1, max_pages + 1)):
-                try:
-                    # 尝试解码整个缓冲区
-                    audio = AudioSegment.from_file(io.BytesIO(bytes(self.ogg_buffer)), format="ogg")
-                    
-                    # 转换为目标格式
-                    audio = audio.set_frame_rate(self.output_config.sample_rate)
-                    audio = audio.set_channels(self.output_config.channels)
-                    
-                    # 根据输出配置设置样本格式 - 先尝试使用 int16 避免转换问题
-                    audio = audio.set_sample_width(2)  # int16 = 2 bytes
-                    pcm_data = audio.raw_data
-                    
-                    print(f"原始解码信息:")
-                    print(f"- 采样率: {audio.frame_rate} Hz")
-                    print(f"- 声道数: {audio.channels}")
-                    print(f"- 样本宽度: {audio.sample_width} bytes")
-                    print(f"- 数据长度: {len(pcm_data)} bytes")
-                    
-                    # 暂时使用 int16 格式，避免 float32 转换问题
-                    # TODO: 如果需要 float32，稍后再优化转换
-                    print(f"成功解码 OGG 流: {len(pcm_data)} 字节 PCM 数据")
-                    
-                    # 清空缓冲区，重新开始
-                    self.ogg_buffer.clear()
-                    self.ogg_pages_count = 0
-                    
-                    return pcm_data
-                    
-                except Exception as e:
-                    # 继续尝试更多页面
-                    continue
-            
-            # 所有尝试都失败了
-            print(f"OGG 流解码失败，尝试了 {min_pages}-{min(self.ogg_pages_count, max_pages)} 个页面")
-            
-            # 如果页面太多或缓冲区太大，重置
-            if self.ogg_pages_count >= max_pages or len(self.ogg_buffer) > 50000:
-                print("重置 OGG 缓冲区")
-                self.ogg_buffer.clear()
-                self.ogg_pages_count = 0
-        
-        # 还没有足够的数据进行解码
-        return b''
-    
     def _convert_ogg_to_pcm(self, ogg_data: bytes) -> bytes:
         """将 OGG/Opus 音频转换为 PCM"""
-        return self._process_ogg_stream(ogg_data)
+        return self.ogg_decoder.decode(ogg_data)
+
+    def _decode_worker(self):
+        """OGG 解码线程，解码结果直接写入播放缓冲区"""
+        while True:
+            item = self._decode_q.get()
+            if item is None:
+                break
+            generation, ogg_data = item
+            if ogg_data is None:
+                # 打断：丢弃被打断流的解析状态，以及解码中途写入的音频
+                self.ogg_decoder.reset()
+                self.audio_ring.clear()
+                continue
+            try:
+                pcm_data = self._convert_ogg_to_pcm(ogg_data)
+                if len(pcm_data) > 0 and generation == self._decode_generation:
+                    self._play_pcm(pcm_data)
+            except Exception as e:
+                log.warning("OGG 解码错误: %s", e)
+
+    def _play_pcm(self, pcm_data: bytes) -> None:
+        """将 PCM 数据写入播放缓冲区"""
+        written = self.audio_ring.write(pcm_data)
+        if written < len(pcm_data):
+            log.warning("音频缓冲区已满，丢弃 %d 字节", len(pcm_data) - written)
 
     def _debug_audio_data(self, audio_data: bytes) -> None:
         """调试音频数据格式"""
-        # 简化调试输出，避免过多信息
+        # 未开启 DEBUG 日志时直接返回，不在每个音频包上做任何格式化
+        if not log.isEnabledFor(logging.DEBUG):
+            return
         if len(audio_data) >= 4 and audio_data[:4] == b'OggS':
-            print(f"OGG页面: {len(audio_data)}字节")
+            log.debug("OGG页面: %d字节", len(audio_data))
+
+    def _handle_ack_pcm(self, audio_data: bytes) -> None:
+        """PCM 音频包：直接写入播放缓冲区"""
+        if len(audio_data) > 0:
+            self._play_pcm(audio_data)
+
+    def _handle_ack_ogg(self, audio_data: bytes) -> None:
+        """OGG 音频包：交给解码线程处理"""
+        # 调试：分析音频数据
+        self._debug_audio_data(audio_data)
+        try:
+            self._decode_q.put_nowait((self._decode_generation, audio_data))
+        except queue.Full:
+            log.warning("解码队列已满，丢弃 OGG 页面: %d字节", len(audio_data))
+
+    def _handle_ack_detect(self, audio_data: bytes) -> None:
+        """首个音频包：检测格式后绑定对应的处理函数"""
+        audio_format = self._detect_audio_format(audio_data)
+        log.debug("检测到音频格式: %s", audio_format)
+        self._handle_ack = self._handle_ack_ogg if audio_format == "ogg" else self._handle_ack_pcm
+        self._handle_ack(audio_data)
 
     def handle_server_response(self, response: Dict[str, Any]) -> None:
         if response == {}:
             return
         """处理服务器响应"""
-        if response['message_type'] == 'SERVER_ACK' and isinstance(response.get('payload_msg'), bytes):
-            audio_data = response['payload_msg']
-            
-            # 调试：分析音频数据
-            self._debug_audio_data(audio_data)
-            
-            # 检测音频格式
-            audio_format = self._detect_audio_format(audio_data)
-            
-            # 如果是 OGG 格式，处理流式数据
-            if audio_format == "ogg":
-                audio_data = self._convert_ogg_to_pcm(audio_data)
-                if len(audio_data) == 0:
-                    return  # 等待更多数据
-            
-            if len(audio_data) > 0:
-                self.audio_queue.put(audio_data)
+        if response['message_type'] == 'SERVER_ACK' and isinstance(response.get('payload_msg'), (bytes, memoryview)):
+            self._handle_ack(response['payload_msg'])
         elif response['message_type'] == 'SERVER_FULL_RESPONSE':
             print(f"服务器响应: {response}")
             if response['event'] == 450:
                 print(f"清空缓存音频: {response['session_id']}")
-                while not self.audio_queue.empty():
-                    try:
-                        self.audio_queue.get_nowait()
-                    except queue.Empty:
-                        continue
+                if self._decode_thread:
+                    self._decode_generation += 1
+                    with self._decode_q.mutex:
+                        self._decode_q.queue.clear()
+                self.audio_ring.clear()
+                if self._decode_thread:
+                    # 解码线程是播放缓冲区的生产者，重置请求经它执行，保证排在正在进行的解码之后；
+                    # PCM 会话由接收线程直接写入，上面的一次清空已经足够
+                    self._decode_q.put_nowait((self._decode_generation, None))
         elif response['message_type'] == 'SERVER_ERROR':
             print(f"服务器错误: {response['payload_msg']}")
             raise Exception("服务器错误")
@@ -243,8 +463,8 @@ class DialogSession:
     def _keyboard_signal(self, sig, frame):
         print(f"receive keyboard Ctrl+C")
         self.is_recording = False
-        self.is_playing = False
         self.is_running = False
+        self._loop.call_soon_threadsafe(self._shutdown.set)
 
     async def receive_loop(self):
         try:
@@ -254,6 +474,7 @@ class DialogSession:
                 if 'event' in response and (response['event'] == 152 or response['event'] == 153):
                     print(f"receive session finished event: {response['event']}")
                     self.is_session_finished = True
+                    self._session_finished_evt.set()
                     break
         except asyncio.CancelledError:
             print("接收任务已取消")
@@ -265,30 +486,48 @@ class DialogSession:
         stream = self.audio_device.open_input_stream()
         print("已打开麦克风，请讲话...")
 
+        loop = asyncio.get_event_loop()
+        read_chunk = functools.partial(stream.read, config.input_audio_config["chunk"], exception_on_overflow=False)
+        # 累积多次读取后再合并发送，减少 WebSocket 帧数
+        batch = bytearray()
+        batch_reads = 0
         while self.is_recording:
             try:
+                # 阻塞读取放到线程池中执行，读取期间事件循环可以继续处理服务端响应
                 # 添加exception_on_overflow=False参数来忽略溢出错误
-                audio_data = stream.read(config.input_audio_config["chunk"], exception_on_overflow=False)
-                save_pcm_to_wav(audio_data, "output.wav")
-                await self.client.task_request(audio_data)
-                await asyncio.sleep(0.01)  # 避免CPU过度使用
+                audio_data = await loop.run_in_executor(None, read_chunk)
+                if self.debug_wav:
+                    self.debug_wav.writeframesraw(audio_data)
+                batch += audio_data
+                batch_reads += 1
+                if batch_reads >= config.input_batch_reads:
+                    await self.client.task_request(bytes(batch))
+                    batch.clear()
+                    batch_reads = 0
             except Exception as e:
                 print(f"读取麦克风数据出错: {e}")
                 await asyncio.sleep(0.1)  # 给系统一些恢复时间
 
+        # 停止录音后发送尚未凑满一批的剩余音频
+        if batch:
+            try:
+                await self.client.task_request(bytes(batch))
+            except Exception as e:
+                print(f"发送剩余麦克风数据出错: {e}")
+
     async def start(self) -> None:
         """启动对话会话"""
         try:
             await self.client.connect()
-            asyncio.create_task(self.process_microphone_input())
+            self._mic_task = asyncio.create_task(self.process_microphone_input())
             asyncio.create_task(self.receive_loop())
 
-            while self.is_running:
-                await asyncio.sleep(0.1)
+            await self._shutdown.wait()
+            # 等麦克风任务发完剩余音频后再结束会话
+            await self._mic_task
 
             await self.client.finish_session()
-            while not self.is_session_finished:
-                await asyncio.sleep(0.1)
+            await self._session_finished_evt.wait()
             await self.client.finish_connection()
             await asyncio.sleep(0.1)
             await self.client.close()
@@ -296,13 +535,14 @@ class DialogSession:
         except Exception as e:
             print(f"会话错误: {e}")
         finally:
+            # 麦克风读取在线程池中执行，必须等它返回后才能关闭输入流
+            self.is_recording = False
+            if self._mic_task:
+                await asyncio.gather(self._mic_task, return_exceptions=True)
+            if self._decode_thread:
+                self._decode_q.put(None)
+            if self.debug_wav:
+                # writeframesraw 不更新文件头，close 时统一回写数据长度
+                self.debug_wav.close()
             self.audio_device.cleanup()
 
-
-def save_pcm_to_wav(pcm_data: bytes, filename: str) -> None:
-    """保存PCM数据为WAV文件"""
-    with wave.open(filename, 'wb') as wf:
-        wf.setnchannels(config.input_audio_config["channels"])
-        wf.setsampwidth(2)  # paInt16 = 2 bytes
-        wf.setframerate(config.input_audio_config["sample_rate"])
-        wf.writeframes(pcm_data)
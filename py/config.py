@@ -1,7 +1,11 @@
 import uuid
+import logging
 import pyaudio
 import os
 
+# 默认只输出 WARNING 及以上日志，音频处理的调试日志需要时改为 logging.DEBUG
+logging.basicConfig(level=logging.WARNING)
+
 # 配置信息
 ws_connect_config = {
     "base_url": "wss://openspeech.bytedance.com/api/v3/realtime/dialogue",
@@ -15,26 +19,33 @@ ws_connect_config = {
 }
 
 start_session_req = {
-    # "tts": {
-    #     "audio_config": {
-    #         "channel": 1,
-    #         "format": "pcm",
-    #         "sample_rate": 24000
-    #     },
-    # },
+    # 直接请求与 output_audio_config 一致的 24kHz int16 单声道 PCM，播放时无需任何转换
+    "tts": {
+        "audio_config": {
+            "channel": 1,
+            "format": "pcm_s16le",
+            "sample_rate": 24000
+        },
+    },
     "dialog": {
         "bot_name": "豆包",
     }
 }
 
 input_audio_config = {
-    "chunk": 3200,
+    "chunk": 1600,
     "format": "pcm",
     "channels": 1,
     "sample_rate": 16000,
     "bit_size": pyaudio.paInt16
 }
 
+# 是否将麦克风输入录制到 output.wav（调试用）
+debug_record = False
+
+# 每累积多少个输入 chunk 发送一次音频请求
+input_batch_reads = 2
+
 output_audio_config = {
     "chunk": 3200,
     "format": "pcm",
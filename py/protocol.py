@@ -87,6 +87,9 @@ def parse_response(res):
     """
     if isinstance(res, str):
         return {}
+    # 使用 memoryview 切片，不再为每一层切片复制整段负载；
+    # 只有 SERVER_ACK 的未序列化音频负载以 memoryview 形式返回
+    res = memoryview(res)
     protocol_version = res[0] >> 4
     header_size = res[0] & 0x0f
     message_type = res[1] >> 4
@@ -112,7 +115,7 @@ def parse_response(res):
             start += 4
         payload = payload[start:]
         session_id_size = int.from_bytes(payload[:4], "big", signed=True)
-        session_id = payload[4:session_id_size]
+        session_id = bytes(payload[4:session_id_size])
         result['session_id'] = str(session_id)
         payload = payload[4 + session_id_size:]
         payload_size = int.from_bytes(payload[:4], "big", signed=False)
@@ -130,6 +133,8 @@ def parse_response(res):
         payload_msg = json.loads(str(payload_msg, "utf-8"))
     elif serialization_method != NO_SERIALIZATION:
         payload_msg = str(payload_msg, "utf-8")
+    elif message_type != SERVER_ACK:
+        payload_msg = bytes(payload_msg)
     result['payload_msg'] = payload_msg
     result['payload_size'] = payload_size
     return result
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+import audio_manager
+from audio_manager import PCMRingBuffer, OggOpusDecoder, DialogSession
+
+
+class FakeOpusDecoder:
+    """用包内容代替解码结果，便于校验包的切分是否正确"""
+
+    def decode(self, packet, frame_size):
+        return b'<' + bytes(packet) + b'>'
+
+    def reset_state(self):
+        pass
+
+
+def make_page(packets, continued=False, unterminated=False):
+    """构造 OGG 页面；unterminated 为 True 时最后一个包延续到下一页"""
+    lacing = []
+    body = b''
+    for i, packet in enumerate(packets):
+        body += packet
+        size = len(packet)
+        while size >= 255:
+            lacing.append(255)
+            size -= 255
+        if not (unterminated and i == len(packets) - 1):
+            lacing.append(size)
+    header_type = 0x01 if continued else 0x00
+    return (b'OggS' + bytes([0, header_type]) + bytes(20)
+            + bytes([len(lacing)]) + bytes(lacing) + body)
+
+
+def make_opus_head(pre_skip=0):
+    return b'OpusHead' + bytes([1, 1]) + pre_skip.to_bytes(2, 'little') + (24000).to_bytes(4, 'little') + bytes(3)
+
+
+def make_decoder():
+    decoder = OggOpusDecoder(24000, 1)
+    decoder._decoder = FakeOpusDecoder()
+    return decoder
+
+
+LONG_PACKET = b'L' * 600
+STREAM = (make_page([make_opus_head()])
+          + make_page([b'OpusTags'])
+          + make_page([b'a1', b'a2'])
+          + make_page([LONG_PACKET[:510]], unterminated=True)
+          + make_page([LONG_PACKET[510:]], continued=True)
+          + make_page([b'z' * 255]))
+EXPECTED = b'<a1><a2><' + LONG_PACKET + b'><' + b'z' * 255 + b'>'
+
+
+def test_ogg_whole_stream():
+    """一次输入完整的流"""
+    assert make_decoder().decode(STREAM) == EXPECTED
+
+
+def test_ogg_fragmented_input():
+    """页面被拆成任意小块输入"""
+    decoder = make_decoder()
+    pcm = b''
+    for i in range(0, len(STREAM), 7):
+        pcm += decoder.decode(STREAM[i:i + 7])
+    assert pcm == EXPECTED
+
+
+def test_ogg_memoryview_input():
+    """protocol.parse_response 返回的 memoryview 负载"""
+    decoder = make_decoder()
+    pcm = b''
+    for i in range(0, len(STREAM), 100):
+        pcm += decoder.decode(memoryview(STREAM)[i:i + 100])
+    assert pcm == EXPECTED
+
+
+def test_ogg_resync_after_garbage():
+    """页面之间夹杂无效数据时跳到下一个页面头"""
+    assert make_decoder().decode(b'junk' + STREAM) == EXPECTED
+
+
+def test_ogg_pre_skip():
+    """丢弃 OpusHead 中 pre-skip 指定的预热样本"""
+    decoder = make_decoder()
+    # 24kHz 单声道下 8 个 48kHz 样本对应 4 个样本，即 8 字节
+    pcm = decoder.decode(make_page([make_opus_head(pre_skip=8)]) + make_page([b'abcd', b'efgh']))
+    assert pcm == b'fgh>'
+
+
+def test_ogg_reset_drops_partial_stream():
+    """打断后不把旧流残留的半个页面和跨页包拼到新流上"""
+    decoder = make_decoder()
+    assert decoder.decode(make_page([LONG_PACKET[:510]], unterminated=True) + STREAM[:10]) == b''
+    decoder.reset()
+    assert decoder.decode(STREAM) == EXPECTED
+
+
+def test_ogg_rejects_non_opus_rate():
+    """libopus 不能直接输出的采样率在创建时报错"""
+    try:
+        OggOpusDecoder(44100, 1)
+    except ValueError:
+        return
+    raise AssertionError("44100Hz 应当被拒绝")
+
+
+def test_ring_buffer_wrap_around():
+    """写入和读取跨越缓冲区末尾"""
+    ring = PCMRingBuffer(10)
+    assert ring._size == 16
+    data = bytes(range(256)) * 4
+    out = bytearray(7)
+    received = bytearray()
+    written = 0
+    while len(received) < len(data):
+        written += ring.write(data[written:written + 5])
+        n = ring.read_into(out, len(out))
+        received += out[:n]
+    assert bytes(received) == data
+
+
+def test_ring_buffer_full():
+    """缓冲区满时只写入剩余空间"""
+    ring = PCMRingBuffer(16)
+    assert ring.write(bytes(20)) == 16
+    assert ring.write(b'x') == 0
+    assert len(ring) == 16
+
+
+def test_ring_buffer_clear():
+    """清空后只读到清空之后写入的数据"""
+    ring = PCMRingBuffer(16)
+    out = bytearray(8)
+    ring.write(b'abcdef')
+    ring.read_into(out, 2)
+    ring.clear()
+    assert len(ring) == 0
+    ring.write(b'XY')
+    n = ring.read_into(out, len(out))
+    assert out[:n] == b'XY'
+
+
+
+class FakeAudioDevice(audio_manager.AudioDeviceManager):
+    """不打开任何音频设备，播放缓冲区只由测试读取"""
+
+    def __init__(self, input_config, output_config):
+        self.input_config = input_config
+        self.output_config = output_config
+
+    def open_output_stream(self, callback):
+        return None
+
+    def cleanup(self):
+        pass
+
+
+class BlockingOpusDecoder(FakeOpusDecoder):
+    """解码 b'old' 包时阻塞，模拟打断时正在解码中的页面"""
+
+    def __init__(self):
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def decode(self, packet, frame_size):
+        if bytes(packet) == b'old':
+            self.entered.set()
+            self.release.wait(timeout=5)
+        return super().decode(packet, frame_size)
+
+
+def make_session(start_session_req):
+    original_device = audio_manager.AudioDeviceManager
+    original_req = config.start_session_req
+    audio_manager.AudioDeviceManager = FakeAudioDevice
+    config.start_session_req = start_session_req
+    try:
+        return DialogSession(config.ws_connect_config)
+    finally:
+        audio_manager.AudioDeviceManager = original_device
+        config.start_session_req = original_req
+
+
+def read_all(ring):
+    out = bytearray(len(ring))
+    n = ring.read_into(out, len(out))
+    return bytes(out[:n])
+
+
+def ack(payload):
+    return {'message_type': 'SERVER_ACK', 'payload_msg': payload}
+
+
+INTERRUPT = {'message_type': 'SERVER_FULL_RESPONSE', 'event': 450, 'session_id': 'test'}
+
+
+def test_session_pcm_audio_after_interrupt_survives():
+    """PCM 会话：打断之后收到的音频不会被清掉"""
+    session = make_session(config.start_session_req)
+    assert session._decode_thread is None
+    session.handle_server_response(ack(b'\x01\x00' * 100))
+    session.handle_server_response(INTERRUPT)
+    session.handle_server_response(ack(b'\x02\x00' * 100))
+    time.sleep(0.1)
+    assert read_all(session.audio_ring) == b'\x02\x00' * 100
+
+
+def test_session_ogg_interrupt_drops_old_generation():
+    """OGG 会话：打断时正在解码的旧页面不会写入播放缓冲区"""
+    session = make_session({"dialog": {"bot_name": "豆包"}})
+    decoder = BlockingOpusDecoder()
+    session.ogg_decoder._decoder = decoder
+    session.handle_server_response(ack(make_page([b'old'])))
+    assert decoder.entered.wait(timeout=5)
+    session.handle_server_response(INTERRUPT)
+    session.handle_server_response(ack(make_page([b'new'])))
+    decoder.release.set()
+    deadline = time.time() + 5
+    while len(session.audio_ring) < len(b'<new>') and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    assert read_all(session.audio_ring) == b'<new>'
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")